@@ -1,45 +1,88 @@
 #!/usr/bin/env python
-import ffmpeg
 import click
+import functools
+import json
 import os
 import logging
-import yaml
+import select
+import subprocess
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 from datetime import datetime
-import colorlog
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from enum import Enum
 
 
-SUPPORTED_GOLF_CLUBS = [
+SUPPORTED_GOLF_CLUBS = frozenset([
     # wedges
-    "L", "S","G", "A", "P", 
+    "L", "S","G", "A", "P",
     # irons
-    "9", "8", "7", "6", "5", "4", "3", "2", "1", 
+    "9", "8", "7", "6", "5", "4", "3", "2", "1",
     # woods
-    "7W", "5W", "4W", "3W", 
+    "7W", "5W", "4W", "3W",
     # hybrids
     "5H", "4H", "3H",
     # driver
-    "D"]
+    "D"])
+_CLUB_CANON = {club.lower(): club for club in SUPPORTED_GOLF_CLUBS}
 CONFIG_DIRECTORY_NAME="golfhelper"
-CONFIG_FILE_NAME="config.yaml"
+CONFIG_FILE_NAME="config.json"
+LEGACY_CONFIG_FILE_NAME="config.yaml"
 CONFIG_KEYS = Enum('ConfigKey', ['ROOT', 'MAX_VIDEO_SIZE_MB'])
+# Hardware encoder backends in order of preference, best first
+HW_ENCODER_BACKENDS = ["videotoolbox", "nvenc", "qsv", "vaapi"]
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+_probe_cache = {}
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler  = logging.StreamHandler()
-handler.setLevel(logging.INFO)
-formatter = colorlog.ColoredFormatter(
-    '[%(log_color)s%(levelname)s]: %(message)s',
-    log_colors={
-        'DEBUG':    'cyan',
-        'INFO':     'green',
-        'WARNING':  'yellow',
-        'ERROR':    'red',
-        'CRITICAL': 'red,bg_white',
-    }
-)
-handler.setFormatter(formatter)
-logger.addHandler(handler)
+
+
+def _configure_logging():
+    """
+    Attaches the colored handler on first use. Importing colorlog and
+    building the handler here instead of at module scope keeps it off
+    the cold-start path for --help.
+    """
+    if logger.handlers:
+        return
+    import colorlog
+    logger.setLevel(logging.INFO)
+    handler  = logging.StreamHandler()
+    handler.setLevel(logging.INFO)
+    formatter = colorlog.ColoredFormatter(
+        '[%(log_color)s%(levelname)s]: %(message)s',
+        log_colors={
+            'DEBUG':    'cyan',
+            'INFO':     'green',
+            'WARNING':  'yellow',
+            'ERROR':    'red',
+            'CRITICAL': 'red,bg_white',
+        }
+    )
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+class ClubParamType(click.ParamType):
+    """
+    Case-insensitive club parameter resolved with a single dict probe,
+    instead of click.Choice's linear scan over the choices.
+    """
+    name = 'club'
+
+    def convert(self, value, param, ctx):
+        club = _CLUB_CANON.get(value.lower())
+        if club is None:
+            self.fail("{!r} is not a supported golf club".format(value), param, ctx)
+        return club
+
+    def get_metavar(self, param):
+        return '[{}]'.format('|'.join(sorted(SUPPORTED_GOLF_CLUBS)))
+
+
+CLUB = ClubParamType()
 
 init = click.Group(help='Helper for organizing golf swing videos')
 
@@ -50,12 +93,11 @@ def setup_tool(root, max_video_size_mb):
     """
     Creates a config file with where the root directory should be stored.
     """
+    _configure_logging()
     if root.startswith('~'):
         root = os.path.expanduser(root)
     config_dir = get_config_dir()
-    if not os.path.exists(config_dir):
-        logger.info("Config not found. Creating directory at: {}".format(config_dir))
-        os.makedirs(config_dir)
+    os.makedirs(config_dir, exist_ok=True)
     with open(os.path.join(config_dir, CONFIG_FILE_NAME), 'w') as config:
         logger.info("Configuring golf helper root directory to: {}".format(root))
         data = {
@@ -63,13 +105,13 @@ def setup_tool(root, max_video_size_mb):
             CONFIG_KEYS.MAX_VIDEO_SIZE_MB.name: max_video_size_mb
         }
         os.makedirs(root, exist_ok=True)
-        yaml.dump(data, config, default_flow_style=False)
+        json.dump(data, config, indent=2)
     logger.info("Finished setup!")
 
 
 @init.command('organize', help='Organizes a video into its proper folder')
 @click.option('--video', prompt='Video to organize', help='Video to convert and organize')
-@click.option('--club', prompt='Club used in video', help='Club used in the video', type=click.Choice(SUPPORTED_GOLF_CLUBS, case_sensitive=False))
+@click.option('--club', prompt='Club used in video', help='Club used in the video', type=CLUB)
 def organize(video, club):
     """
     1. Load our config to check where videos should be stored
@@ -77,11 +119,14 @@ def organize(video, club):
     3. Convert video to mp4 format
     4. Compress video if necessary
     """
+    _configure_logging()
     # Load our config to check where videos should be stored
     if video.startswith('~'):
         video = os.path.expanduser(video)
     original_path = video
     config = get_config()
+    if config is None:
+        return
     root_dir = config[CONFIG_KEYS.ROOT.name]
     max_video_size_bytes = config[CONFIG_KEYS.MAX_VIDEO_SIZE_MB.name] * 1024 * 1024
 
@@ -89,67 +134,359 @@ def organize(video, club):
         logger.error("Video provided is not a supported format.")
         return
     # Create directory for our new videos along with directory for analysis
-    date = datetime.now().strftime('%y-%m-%d')
+    date = _session_date()
+    golf_video_dir = _make_session_dirs(root_dir, date)
+    counter = _next_free_index(golf_video_dir, club)
+    output_file_compressed = f"{golf_video_dir}{os.sep}{club}_{counter}.mp4"
+
+    # Convert and compress in a single ffmpeg pass over the source video
+    ffmpeg_cmd = _start_encode(video, output_file_compressed, max_video_size_bytes)
+    if ffmpeg_cmd is None:
+        # The source was renamed into place, so there is no separate
+        # original left to ask about
+        logger.info("Created a video at: {}".format(output_file_compressed))
+        return
+
+    # Ask about the original while ffmpeg is still running so the user's
+    # reaction time overlaps with the encode
+    response = click.prompt("Delete the original video? (y/n)", type=click.Choice(['y','n','Y', 'N']))
+    print_ffmpeg(ffmpeg_cmd)
+    if ffmpeg_cmd.wait() != 0:
+        logger.error("ffmpeg failed with exit code: {}".format(ffmpeg_cmd.returncode))
+        return
+    _drop_page_cache(video)
+    _drop_page_cache(output_file_compressed)
+    logger.info("Created a video at: {}".format(output_file_compressed))
+    if response.lower() == 'y':
+        os.remove(original_path)
+
+@init.command('organize_batch', help='Organizes a directory of videos in parallel')
+@click.option('--src-dir', prompt='Directory of videos to organize', help='Directory containing videos to convert and organize')
+@click.option('--club', prompt='Club used in videos', help='Club used in the videos', type=CLUB)
+def organize_batch(src_dir, club):
+    """
+    Runs the organize pipeline over every video in a directory, with
+    several ffmpeg processes in flight at once. Concurrency is bounded
+    by half the CPU count, or by the typical two-session cap when the
+    encodes run on an NVIDIA GPU.
+    """
+    _configure_logging()
+    if src_dir.startswith('~'):
+        src_dir = os.path.expanduser(src_dir)
+    config = get_config()
+    if config is None:
+        return
+    root_dir = config[CONFIG_KEYS.ROOT.name]
+    max_video_size_bytes = config[CONFIG_KEYS.MAX_VIDEO_SIZE_MB.name] * 1024 * 1024
+
+    videos = sorted(
+        entry.path for entry in os.scandir(src_dir)
+        if entry.name.lower().endswith(('.mov', '.mp4')))
+    if not videos:
+        logger.error("No videos found in: {}".format(src_dir))
+        return
+
+    date = _session_date()
+    golf_video_dir = _make_session_dirs(root_dir, date)
+    # Assign output slots up front so concurrent workers can't race for
+    # the same club_N.mp4 name
+    counter = _next_free_index(golf_video_dir, club)
+    # The directory and club parts of the output name are loop
+    # invariants, so the path prefix is built once outside the loop
+    output_prefix = f"{golf_video_dir}{os.sep}{club}_"
+    if _detect_hwenc() is not None and _detect_hwenc().endswith('_nvenc'):
+        max_workers = 2
+    else:
+        max_workers = max(1, (os.cpu_count() or 2) // 2)
+    logger.info("Organizing {} videos with {} workers...".format(len(videos), max_workers))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for i, video in enumerate(videos):
+            output_file = f"{output_prefix}{counter + i}.mp4"
+            futures[pool.submit(_organize_one, video, output_file, max_video_size_bytes)] = video
+        for future in as_completed(futures):
+            try:
+                logger.info("Created a video at: {}".format(future.result()))
+            except Exception as e:
+                logger.error("Failed to organize {}: {}".format(futures[future], e))
+
+
+def _session_date():
+    """
+    Returns today's yy-mm-dd session string, cached per calendar day so
+    repeated calls skip strftime's locale machinery. organize_batch
+    reads it once before dispatch so every video from a session lands
+    in the same day folder even if midnight rolls over mid-batch.
+    """
+    return _format_session_date(datetime.now().toordinal())
+
+
+@functools.lru_cache(maxsize=1)
+def _format_session_date(ordinal):
+    return datetime.fromordinal(ordinal).strftime('%y-%m-%d')
+
+
+def _make_session_dirs(root_dir, date):
+    """
+    Creates the day's session directories and returns the video directory.
+    """
     new_golf_dir = os.path.join(root_dir, date)
     golf_video_dir = os.path.join(new_golf_dir, 'videos')
     golf_analysis_dir = os.path.join(new_golf_dir, 'analyze')
-    os.makedirs(new_golf_dir, exist_ok=True)
     os.makedirs(golf_video_dir, exist_ok=True)
     os.makedirs(golf_analysis_dir, exist_ok=True)
+    return golf_video_dir
 
-    counter = 0
-    output_file=os.path.join(golf_video_dir, club + "_" + str(counter))
-    output_file_compressed = os.path.join(output_file + ".mp4")
-    output_file_uncompressed = os.path.join(output_file + "_unc" + ".mp4")
-    while os.path.exists(output_file_compressed):
-        counter += 1
-        output_file=os.path.join(golf_video_dir, club + "_" + str(counter))
-        output_file_compressed = os.path.join(output_file + ".mp4")
-        output_file_uncompressed = os.path.join(output_file + "_unc" + ".mp4")
-
-    # Convert video to mp4 format
-    if video.lower().endswith('.mov'):
-        logger.info("Converting video from mov to mp4...")
-        ffmpeg_convert_cmd = (
-            ffmpeg
-                .input(video)
-                .output(output_file_uncompressed, **{'c:v': 'copy', 'c:a': 'copy'})
-                .overwrite_output()
-                .run_async(pipe_stdout=True, pipe_stderr=True)
-        )
-        print_ffmpeg(ffmpeg_convert_cmd)
-        video = output_file_uncompressed
-        ffmpeg_convert_cmd.wait()
-
-    # Compress video if necessary
+
+def _next_free_index(golf_video_dir, club):
+    """
+    Finds the next free club_N.mp4 index with a single directory scan
+    instead of stat-ing each candidate filename in turn.
+    """
+    prefix = club + "_"
+    max_idx = -1
+    for entry in os.scandir(golf_video_dir):
+        name = entry.name
+        if name.startswith(prefix) and name.endswith('.mp4'):
+            try:
+                max_idx = max(max_idx, int(name[len(prefix):-4].removesuffix('_unc')))
+            except ValueError:
+                pass
+    return max_idx + 1
+
+
+def _start_encode(video, output_file_compressed, max_video_size_bytes):
+    """
+    Launches the ffmpeg process that produces output_file_compressed
+    from video, returning the running process, or None if the video was
+    small enough to move into place without ffmpeg.
+    """
+    # Size is checked first so an oversized mov feeds the compressing
+    # encode directly (libavformat demuxes mov natively); only small
+    # movs get the copy remux, and small mp4s are just moved into place
     video_size = os.path.getsize(video)
     if video_size > max_video_size_bytes:
         logger.info("Compressing video...")
-        ffmpeg_compress_cmd = (
-            ffmpeg
-                .input(video)
-                .output(output_file_compressed, vf='scale=iw/2:-1', strict='-2')
-                .overwrite_output()
-                .run_async(pipe_stdout=True, pipe_stderr=True)
-        )
-        print_ffmpeg(ffmpeg_compress_cmd)
-        ffmpeg_compress_cmd.wait()
+        # Stay in the source's codec family where a hardware encoder
+        # exists for it; re-encoding hevc (iPhone HDR) as hevc keeps
+        # the HDR metadata intact
+        family = 'hevc' if _probe_codec(video) == 'hevc' else 'h264'
+        encoder = _detect_hwenc(family)
+        if encoder is None and family != 'h264':
+            encoder = _detect_hwenc()
+        input_args, scale_filter, codec_args = _encoder_args(encoder)
+        # faststart moves the moov atom to the head so the output can
+        # stream before it is fully downloaded; -threads 0 lets the
+        # software encoder scale to every available core
+        argv = (['ffmpeg', '-y'] + input_args
+                + ['-i', video, '-vf', scale_filter, '-strict', '-2']
+                + codec_args
+                + ['-movflags', '+faststart', '-threads', '0', output_file_compressed])
+    elif video.lower().endswith('.mov'):
+        logger.info("Converting video from mov to mp4...")
+        argv = ['ffmpeg', '-y', '-i', video, '-c:v', 'copy', '-c:a', 'copy',
+                '-movflags', '+faststart', output_file_compressed]
     else:
         os.rename(video, output_file_compressed)
-    if os.path.exists(output_file_uncompressed):
-        logger.info("Removing uncompressed video...")
-        os.remove(output_file_uncompressed)
-    logger.info("Created a video at: {}".format(output_file_compressed))
-    response = click.prompt("Delete the original video? (y/n)", type=click.Choice(['y','n','Y', 'N']))
-    if response.lower() == 'y':
-        os.remove(original_path)
+        return None
+    ffmpeg_cmd = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _widen_pipes(ffmpeg_cmd)
+    return ffmpeg_cmd
+
+
+def _widen_pipes(cmd):
+    """
+    Bumps the process's pipe buffers from the 64KB default to 1MiB so
+    ffmpeg can keep logging while the caller is busy elsewhere, e.g.
+    blocked in the delete-original prompt before the drain starts.
+    """
+    if fcntl is None or not hasattr(fcntl, 'F_SETPIPE_SZ'):
+        return
+    for pipe in (cmd.stdout, cmd.stderr):
+        if pipe is not None:
+            try:
+                fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, 1 << 20)
+            except OSError:
+                pass
+
+
+def _organize_one(video, output_file_compressed, max_video_size_bytes):
+    """
+    Worker for organize_batch: runs one video through the encode
+    pipeline to completion and returns the output path.
+    """
+    ffmpeg_cmd = _start_encode(video, output_file_compressed, max_video_size_bytes)
+    if ffmpeg_cmd is not None:
+        print_ffmpeg(ffmpeg_cmd)
+        if ffmpeg_cmd.wait() != 0:
+            raise RuntimeError("ffmpeg failed with exit code: {}".format(ffmpeg_cmd.returncode))
+        _drop_page_cache(video)
+        _drop_page_cache(output_file_compressed)
+    return output_file_compressed
+
+
+def _drop_page_cache(path):
+    """
+    Hints the kernel to drop cached pages for path. The encode streams
+    through both files exactly once, and a multi-GB video would
+    otherwise evict everything else the user has warm in the page cache.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+@functools.cache
+def _ffmpeg_encoders():
+    """
+    Returns ffmpeg's encoder listing, probed once per process.
+    """
+    try:
+        return subprocess.run(
+            ["ffmpeg", "-hide_banner", "-encoders"],
+            capture_output=True, text=True).stdout
+    except OSError:
+        return ""
+
+
+@functools.cache
+def _detect_hwenc(family='h264'):
+    """
+    Returns the best usable hardware encoder for the given codec
+    family, or None if only software encoders work. ffmpeg -encoders
+    lists what the build was compiled with, not what this machine can
+    run, so each candidate is validated with a one-frame test encode.
+    """
+    encoders = _ffmpeg_encoders()
+    for backend in HW_ENCODER_BACKENDS:
+        encoder = family + "_" + backend
+        if encoder in encoders and _encoder_works(encoder):
+            logger.debug("Using hardware encoder: {}".format(encoder))
+            return encoder
+    return None
+
+
+def _encoder_args(encoder):
+    """
+    Returns the (input_args, scale_filter, codec_args) argv pieces for
+    an encoder; each hardware backend needs its own frame upload and
+    scaling plumbing, and they don't share option names.
+    """
+    if encoder is None:
+        return [], 'scale=iw/2:-1', ['-c:v', 'libx264', '-preset', 'veryfast']
+    if encoder.endswith('_nvenc'):
+        # Decoded frames stay in CUDA memory, so the scale must too
+        return (['-hwaccel', 'cuda', '-hwaccel_output_format', 'cuda'],
+                'scale_cuda=iw/2:-2',
+                ['-c:v', encoder, '-preset', 'p4', '-tune', 'hq', '-rc', 'vbr', '-cq', '28'])
+    if encoder.endswith('_vaapi'):
+        # vaapi only encodes hardware frames: upload after the software
+        # decode, then scale on the device
+        return (['-vaapi_device', VAAPI_DEVICE],
+                'format=nv12,hwupload,scale_vaapi=iw/2:-2',
+                ['-c:v', encoder])
+    if encoder.endswith('_qsv'):
+        return [], 'scale=iw/2:-1', ['-c:v', encoder, '-preset', 'fast']
+    # videotoolbox takes system-memory frames and has no preset option
+    return [], 'scale=iw/2:-1', ['-c:v', encoder]
+
+
+def _encoder_works(encoder):
+    """
+    Checks that an encoder actually runs on this machine by encoding a
+    single tiny generated frame through the same upload plumbing the
+    real encode would use.
+    """
+    input_args, _, codec_args = _encoder_args(encoder)
+    if encoder.endswith('_vaapi'):
+        filter_args = ['-vf', 'format=nv12,hwupload']
+    else:
+        # The generated frame is a software frame, so skip the cuda
+        # hwaccel flags (they only apply to decoding a real stream)
+        input_args = []
+        filter_args = []
+    argv = (['ffmpeg', '-hide_banner', '-v', 'error'] + input_args
+            + ['-f', 'lavfi', '-i', 'nullsrc=s=64x64:d=0.1'] + filter_args
+            + codec_args + ['-frames:v', '1', '-f', 'null', '-'])
+    try:
+        return subprocess.run(
+            argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+    except OSError:
+        return False
+
+
+def _probe_codec(video):
+    """
+    Returns the codec name of the first video stream ('h264', 'hevc',
+    ...), or None if ffprobe is unavailable or can't parse the file.
+    Results are cached per (path, mtime).
+    """
+    try:
+        key = (video, os.stat(video).st_mtime)
+    except OSError:
+        return None
+    if key in _probe_cache:
+        return _probe_cache[key]
+    codec = None
+    try:
+        probe = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=codec_name", "-of", "json", video],
+            capture_output=True, text=True).stdout
+        streams = json.loads(probe).get('streams')
+        if streams:
+            codec = streams[0].get('codec_name')
+    except (OSError, ValueError):
+        pass
+    _probe_cache[key] = codec
+    return codec
+
 
 def print_ffmpeg(cmd):
-    for line in cmd.stdout:
-        logger.debug(line.decode().strip())
-    for line in cmd.stderr:
-        logger.debug(line.decode().strip())
+    """
+    Drains ffmpeg's stdout and stderr concurrently. Reading the pipes
+    one after the other can deadlock once ffmpeg fills the pipe we are
+    not reading, so both are multiplexed with select and read in large
+    chunks instead of line by line.
+    """
+    debug = logger.isEnabledFor(logging.DEBUG)
+    pipes = [pipe for pipe in (cmd.stdout, cmd.stderr) if pipe is not None]
+    if os.name == 'nt':
+        # select only works on sockets on Windows; with stdout going to
+        # DEVNULL there is a single pipe, so a blocking drain can't
+        # deadlock there
+        for pipe in pipes:
+            for line in pipe:
+                if debug:
+                    logger.debug(line.decode().strip())
+        return
+    buffers = {pipe.fileno(): b"" for pipe in pipes}
+    while pipes:
+        readable, _, _ = select.select(pipes, [], [])
+        for pipe in readable:
+            chunk = os.read(pipe.fileno(), 65536)
+            if not chunk:
+                pipes.remove(pipe)
+                continue
+            if not debug:
+                continue
+            lines = (buffers[pipe.fileno()] + chunk).split(b'\n')
+            buffers[pipe.fileno()] = lines.pop()
+            for line in lines:
+                logger.debug(line.decode().strip())
+    if debug:
+        for rest in buffers.values():
+            if rest:
+                logger.debug(rest.decode().strip())
 
+@functools.cache
 def get_config_dir():
     if os.name == 'posix':
         return os.path.expanduser("~/.config/" + CONFIG_DIRECTORY_NAME)
@@ -160,13 +497,41 @@ def get_config_dir():
 
 def get_config():
     config_dir = get_config_dir()
-    if not os.path.exists(config_dir):
+    config_path = os.path.join(config_dir, CONFIG_FILE_NAME)
+    if not os.path.exists(config_path):
+        data = _migrate_legacy_config(config_dir, config_path)
+        if data is not None:
+            return data
         logger.error("Config not found. Have you run setup? Try golfhelper --help for details")
         return
-    else:
-        with open(os.path.join(config_dir, CONFIG_FILE_NAME), 'r') as config:
-            data = yaml.safe_load(config)
-        return data
+    with open(config_path, 'r') as config:
+        return json.load(config)
+
+
+def _migrate_legacy_config(config_dir, config_path):
+    """
+    One-shot migration from the old YAML config (and its parse cache)
+    to JSON. Returns the migrated config, or None if there is nothing
+    to migrate.
+    """
+    legacy_path = os.path.join(config_dir, LEGACY_CONFIG_FILE_NAME)
+    if not os.path.exists(legacy_path):
+        return None
+    try:
+        import yaml
+    except ImportError:
+        logger.error("Found legacy config at {} but PyYAML is not installed to migrate it".format(legacy_path))
+        return None
+    logger.info("Migrating legacy config to: {}".format(config_path))
+    with open(legacy_path, 'r') as legacy:
+        data = yaml.safe_load(legacy)
+    with open(config_path, 'w') as config:
+        json.dump(data, config, indent=2)
+    os.remove(legacy_path)
+    legacy_cache_path = legacy_path + ".cache.pkl"
+    if os.path.exists(legacy_cache_path):
+        os.remove(legacy_cache_path)
+    return data
 
 
 if __name__ == '__main__':